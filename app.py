@@ -4,23 +4,64 @@ This file defines the general settings for the project.
 
 import os
 
-from bson import ObjectId
-from flask import Flask
+import pymongo
+from flask import Flask, url_for
 from flask_login import LoginManager
+from jinja2 import FileSystemBytecodeCache
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 
+import idempotency
+import repositories
+import sessions
 from models import User
 
 # connect to instance of MongoDB Atlas database
-client = MongoClient(os.getenv('MONGODB_URI'))
+# connect=False defers opening the connection pool until the first operation (or the warmup),
+# so importing this module does not block a fresh worker on the network
+client = MongoClient(os.getenv('MONGODB_URI'), connect=False,
+                     minPoolSize=int(os.getenv('MONGODB_MIN_POOL_SIZE', 0)))
 db = client.flask_db
 
 
-def create_app():  # creates an app instance to be run
+def create_app(config=None):  # creates an app instance to be run
     app = Flask(__name__)
 
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')  # configures app's secret key
     app.config['DATABASE'] = db  # configures app's database
+    app.config['REPOSITORY_BACKEND'] = os.getenv('REPOSITORY_BACKEND', 'mongo')  # where users and todos are stored
+    app.config['WARMUP'] = os.getenv('WARMUP', '1') == '1'  # warms app up before serving the first request
+    app.config['TEMPLATE_CACHE_DIR'] = os.getenv('TEMPLATE_CACHE_DIR')  # on-disk bytecode cache shared by workers
+    app.config['MONGODB_PREWARM'] = os.getenv('MONGODB_PREWARM', '0') == '1'  # opens Mongo pool during warmup
+    app.config['MONGODB_PREWARM_TIMEOUT'] = float(os.getenv('MONGODB_PREWARM_TIMEOUT', 2))  # seconds warmup waits
+    app.config['SESSION_BACKEND'] = os.getenv('SESSION_BACKEND')  # where users' sessions are stored
+    app.config['SESSION_MAX_SIZE'] = int(os.getenv('SESSION_MAX_SIZE', 10000))  # sessions kept by memory backend
+    app.config['SESSION_LIFETIME'] = int(os.getenv('SESSION_LIFETIME', 86400))  # seconds without "remember me"
+    app.config['IDEMPOTENCY_BACKEND'] = os.getenv('IDEMPOTENCY_BACKEND')  # where idempotency keys are stored
+    app.config['IDEMPOTENCY_TTL'] = int(os.getenv('IDEMPOTENCY_TTL', 86400))  # seconds idempotency keys are kept
+    app.config['IDEMPOTENCY_MAX_SIZE'] = int(os.getenv('IDEMPOTENCY_MAX_SIZE', 10000))  # keys kept by memory backend
+    # seconds a request holds its idempotency key, should outlast the workers' request timeout
+    app.config['IDEMPOTENCY_LEASE'] = int(os.getenv('IDEMPOTENCY_LEASE', 60))
+    app.config.update(config or {})  # overrides settings with the ones provided by the caller
+
+    # sessions and idempotency keys are stored alongside users and todos, unless configured otherwise
+    app.config['SESSION_BACKEND'] = app.config['SESSION_BACKEND'] or app.config['REPOSITORY_BACKEND']
+    app.config['IDEMPOTENCY_BACKEND'] = app.config['IDEMPOTENCY_BACKEND'] or app.config['REPOSITORY_BACKEND']
+
+    # stores compiled templates on disk, so other workers (and restarts) can skip compilation
+    if app.config['TEMPLATE_CACHE_DIR']:
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+    # configures app's users and todos repositories
+    app.config['USERS'], app.config['TODOS'] = repositories.create_repositories(app, db)
+
+    # configures app's server-side session store
+    app.config['SESSION_STORE'] = sessions.create_store(app, db)
+
+    # configures app's idempotency key store and lets templates generate keys for their forms
+    app.config['IDEMPOTENCY_STORE'] = idempotency.create_store(app, db)
+    app.jinja_env.globals['idempotency_key'] = idempotency.new_key
 
     # registers blueprint for app's auth routes
     from auth import auth as auth_blueprint
@@ -35,13 +76,38 @@ def create_app():  # creates an app instance to be run
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
 
-    # LoginManager fetches user instance from MongoDB
-    # and returns it logged-in if it exists
+    # LoginManager fetches user instance from the session store
+    # and returns it logged-in if the session exists
     @login_manager.user_loader
-    def load_user(user_id):
-        user = db.users.find_one({'_id': ObjectId(user_id)})
+    def load_user(session_id):
+        user = app.config['SESSION_STORE'].get(session_id)
         if user:
-            return User(user)
+            return User(user, session_id)
+
+    if app.config['WARMUP']:
+        warmup(app)
 
     # returns app instance
     return app
+
+
+# warmup method does the work that would otherwise slow down the first requests served by a fresh worker
+def warmup(app):  # parameter app required
+    # compiles every template and keeps it in Jinja's in-memory cache
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+    # builds the URL map's matcher and resolves every rule, filling its arguments with dummy values
+    app.url_map.update()
+    with app.test_request_context():
+        for rule in app.url_map.iter_rules():
+            url_for(rule.endpoint, **{argument: 'warmup' for argument in rule.arguments})
+
+    # opens a connection to MongoDB ahead of time instead of on the first query,
+    # giving up quickly so an unreachable database does not hold the worker back
+    if app.config['MONGODB_PREWARM']:
+        try:
+            with pymongo.timeout(app.config['MONGODB_PREWARM_TIMEOUT']):
+                client.admin.command('ping')
+        except PyMongoError:
+            app.logger.warning('MongoDB is unreachable, connection will be retried on first request')
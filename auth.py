@@ -6,13 +6,17 @@ that may arise during the handling of the requests, as well as redirections.
 """
 
 from bson import ObjectId
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_user, login_required, logout_user, current_user
+from flask_login.config import COOKIE_NAME
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from app import db
 from models import User
 
+# users repository of the current app (see repositories.py)
+users = LocalProxy(lambda: current_app.config['USERS'])
+
 # creates blueprint for app's auth routes
 auth = Blueprint('auth', __name__)
 
@@ -29,7 +33,7 @@ def login():  # no parameters needed
             remember = True if request.form.get('remember') else False  # field 'remember' from submitted form
 
             # fetches user from database by email
-            user = db.users.find_one({'email': email})
+            user = users.find_by_email(email)
 
             # if user with provided email was not found or passwords did not match
             if not user or not check_password_hash(user['password'], password):
@@ -39,7 +43,8 @@ def login():  # no parameters needed
                 return redirect(url_for('auth.login'))
 
             # if user was found and password checked
-            model = User(user)  # create local instance of User with JSON-like document from database
+            session_id = current_app.config['SESSION_STORE'].create(user, remember)  # stores server-side session
+            model = User(user, session_id)  # create local instance of User with JSON-like document from database
 
             # logs user in with LoginManager
             login_user(model, remember=remember)
@@ -60,7 +65,7 @@ def signup():  # no parameters needed
             password = request.form.get('password')  # field 'password' from submitted form
 
             # fetches user from database by email
-            user = db.users.find_one({'email': email})
+            user = users.find_by_email(email)
 
             # if user with provided email already exists in the database
             if user:
@@ -69,8 +74,7 @@ def signup():  # no parameters needed
 
             # if provided email is available
             # insert to database with fields from form
-            db.users.insert_one(
-                {'email': email, 'name': name, 'password': generate_password_hash(password, method='sha256')})
+            users.insert({'email': email, 'name': name, 'password': generate_password_hash(password, method='sha256')})
 
             return redirect(url_for('auth.login'))  # redirects to login page
         else:  # if request method is GET
@@ -81,6 +85,8 @@ def signup():  # no parameters needed
 @auth.route('/logout')  # accepts GET requests at specified URL
 @login_required  # only logged-in users allowed
 def logout():  # no parameters needed
+    if current_user.session_id:  # revokes server-side session, so "remember me" cookie stops working
+        current_app.config['SESSION_STORE'].revoke(current_user.session_id)
     logout_user()  # logs user out with LoginManager
     return redirect(url_for('main.index'))  # redirects to home page
 
@@ -95,17 +101,25 @@ def update(user_id):  # parameter user_id required
         password = request.form.get('password')  # field 'password' from submitted form
 
         # if provided email is different from the current one, but is already in use by other user
-        if current_user.email != email and db.users.find_one({'email': email}):
+        if current_user.email != email and users.find_by_email(email):
             flash('Email address already in use')  # renders error message to be displayed
             return redirect(url_for('main.profile'))  # redirects to profile page
 
         # if new email is available
         # update to database with fields from form
-        db.users.update_one({"_id": current_user.id}, {"$set": {
+        users.update(current_user.id, {
             "email": email,
             "name": name,
             "password": generate_password_hash(password, method='sha256'),
-        }})
+        })
+
+        # revokes every session of the user, so the old password no longer grants access anywhere,
+        # then logs the current browser back in with a new session holding the updated details
+        store = current_app.config['SESSION_STORE']
+        store.revoke_user(current_user.id)
+        user = {'_id': current_user.id, 'email': email, 'name': name}
+        remember = current_app.config.get('REMEMBER_COOKIE_NAME', COOKIE_NAME) in request.cookies
+        login_user(User(user, store.create(user, remember)), remember=remember)
 
     return redirect(url_for('main.profile'))  # redirects to profile page
 
@@ -116,7 +130,8 @@ def update(user_id):  # parameter user_id required
 def delete(user_id):  # parameter user_id required
     if ObjectId(user_id) == current_user.id:  # if users are the same
         # delete user from database by id
-        db.users.delete_one({"_id": current_user.id})
+        users.delete(current_user.id)
+        current_app.config['SESSION_STORE'].revoke_user(current_user.id)  # revokes every session of the user
         return logout()  # logs local instance of User out with local logout()
 
     return redirect(url_for('main.profile'))  # redirects to profile page
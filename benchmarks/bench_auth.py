@@ -0,0 +1,54 @@
+"""
+This file benchmarks the per-request cost of authenticating a logged-in user.
+It times Flask-Login's user loader against each session backend, and, if MONGODB_URI is set,
+against the previous approach of fetching the user from the users collection on every request.
+It also times full authenticated requests to the profile page, which does not query the database.
+Run it from the root of the project:
+
+    python benchmarks/bench_auth.py [requests]
+"""
+
+import os
+import sys
+import timeit
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from models import User  # noqa: E402
+
+
+# report method prints the mean time of a single call in microseconds
+def report(label, function, requests):  # parameters label, function and requests required
+    seconds = min(timeit.repeat(function, number=requests, repeat=5))
+    print(f'{label:<40}{seconds / requests * 1e6:>10.1f} us/request')
+
+
+def main(requests):  # parameter requests required
+    user = {'_id': ObjectId(), 'email': 'bench@email.com', 'name': 'bench', 'password': 'hash'}
+    backends = ['memory'] + (['mongo'] if os.getenv('MONGODB_URI') else [])
+
+    if os.getenv('MONGODB_URI'):  # previous approach, one users lookup per request
+        db.users.insert_one(user)
+        report('user loader (users collection)', lambda: User(db.users.find_one({'_id': user['_id']})), requests)
+        db.users.delete_one({'_id': user['_id']})
+
+    for backend in backends:
+        app = create_app({'TESTING': True, 'SECRET_KEY': 'bench', 'SESSION_BACKEND': backend})
+        store = app.config['SESSION_STORE']
+        session_id = store.create(user)
+        report(f'user loader ({backend} sessions)', lambda: User(store.get(session_id), session_id), requests)
+
+        # authenticated request going through the session cookie and the user loader
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = session_id
+            session['_fresh'] = True
+        report(f'GET /profile ({backend} sessions)', lambda: client.get('/profile'), requests)
+        store.revoke_user(user['_id'])
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
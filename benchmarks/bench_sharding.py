@@ -0,0 +1,74 @@
+"""
+This file benchmarks the throughput of the todos workload against sharded clusters of growing size.
+For each shard count it starts a local cluster with scripts/local_cluster.sh, shards the todos collection
+with sharding.py and runs concurrent clients that, like main.py, insert and list todos of random users.
+It also checks through explain that listing a user's todos is routed to a single shard.
+Shards of a local cluster share the same machine, so scaling flattens once its cores are saturated.
+Requires mongod, mongos and mongosh on the PATH. Run it from the root of the project:
+
+    python benchmarks/bench_sharding.py [shard counts...]
+"""
+
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharding import shard_todos  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'local_cluster.sh')
+PORT = int(os.getenv('CLUSTER_PORT', 28017))  # port of the benchmark's mongos, away from any local mongod
+KIND = os.getenv('TODOS_SHARD_KEY', 'hashed')  # kind of shard key to benchmark
+USERS = [ObjectId() for _ in range(1000)]  # simulated users
+CLIENTS = 32  # concurrent clients
+DURATION = 10  # seconds each run lasts
+
+
+# work method runs the workload of a single client until the deadline and returns the operations done
+def work(todos, deadline):  # parameters todos and deadline required
+    operations = 0
+    while time.perf_counter() < deadline:
+        user_id = random.choice(USERS)
+        todos.insert_one({'content': 'bench', 'degree': 'Important', 'done': False, 'user_id': user_id})
+        list(todos.find({'user_id': user_id}).sort('_id'))
+        operations += 2
+    return operations
+
+
+# run method benchmarks a freshly started cluster with the given number of shards
+def run(shards):  # parameter shards required
+    subprocess.run([SCRIPT, 'start', str(shards), str(PORT)], check=True)
+    try:
+        client = MongoClient(f'mongodb://localhost:{PORT}', maxPoolSize=CLIENTS)
+        shard_todos(client, 'bench_db', KIND)
+        todos = client.bench_db.todos
+
+        # listing a user's todos must be targeted at one shard, not scattered to all of them
+        plan = todos.find({'user_id': USERS[0]}).explain()['queryPlanner']['winningPlan']
+        targeted = plan['stage'] == 'SINGLE_SHARD' or len(plan.get('shards', [])) == 1
+
+        deadline = time.perf_counter() + DURATION
+        with ThreadPoolExecutor(CLIENTS) as executor:
+            operations = sum(executor.map(work, [todos] * CLIENTS, [deadline] * CLIENTS))
+        client.close()
+        return operations / DURATION, targeted
+    finally:
+        subprocess.run([SCRIPT, 'stop', str(PORT)], check=True)
+
+
+def main(counts):  # parameter counts required
+    print(f'{"shards":>6}{"ops/s":>12}  targeted  ({KIND} shard key, {CLIENTS} clients, {DURATION}s)')
+    for shards in counts:
+        throughput, targeted = run(shards)
+        print(f'{shards:>6}{throughput:>12.0f}  {targeted}')
+
+
+if __name__ == '__main__':
+    main([int(count) for count in sys.argv[1:]] or [1, 2, 4])
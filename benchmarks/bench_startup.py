@@ -0,0 +1,52 @@
+"""
+This file benchmarks the cold start of the app.
+Each run spawns a fresh Python interpreter, as a new worker would be after a deploy, and measures
+the time from importing the app to the first response, with and without the warmup phase.
+Run it from the root of the project:
+
+    python benchmarks/bench_startup.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+# code run by each fresh worker, prints the elapsed times in milliseconds
+WORKER = """
+import time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+ready = time.perf_counter()
+response = app.test_client().get('/')
+first = time.perf_counter()
+assert response.status_code == 200
+print((ready - start) * 1000, (first - ready) * 1000, (first - start) * 1000)
+"""
+
+
+# run method spawns a fresh worker with the given environment and returns its timings
+def run(env):  # parameter env required
+    output = subprocess.run([sys.executable, '-c', WORKER], env={**os.environ, **env}, check=True,
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    return [float(value) for value in output.stdout.split()]
+
+
+def main(runs):  # parameter runs required
+    cache_dir = os.path.join(os.path.dirname(__file__), '.jinja_cache')
+    scenarios = (
+        ('no warmup', {'WARMUP': '0'}),
+        ('warmup', {'WARMUP': '1'}),
+        ('warmup + bytecode cache', {'WARMUP': '1', 'TEMPLATE_CACHE_DIR': cache_dir}),
+    )
+
+    print(f'{"scenario":<26}{"create_app":>12}{"first response":>16}{"total":>10}  (median ms, {runs} runs)')
+    for label, env in scenarios:
+        timings = [run(env) for _ in range(runs)]
+        medians = [statistics.median(column) for column in zip(*timings)]
+        print(f'{label:<26}{medians[0]:>12.1f}{medians[1]:>16.1f}{medians[2]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
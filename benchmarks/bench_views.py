@@ -0,0 +1,53 @@
+"""
+This file benchmarks the view logic of the app without any I/O.
+Views run against the in-memory repositories, sessions and idempotency keys, so the timings cover only
+Flask, Flask-Login, the views and the templates. Run it from the root of the project:
+
+    python benchmarks/bench_views.py [requests]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+
+TODOS = 50  # to-dos listed by the home page
+
+
+# report method prints the mean time of a single request in microseconds
+def report(label, function, requests):  # parameters label, function and requests required
+    seconds = min(timeit.repeat(function, number=requests, repeat=5))
+    print(f'{label:<40}{seconds / requests * 1e6:>10.1f} us/request')
+
+
+def main(requests):  # parameter requests required
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'bench', 'REPOSITORY_BACKEND': 'memory'})
+    users, todos = app.config['USERS'], app.config['TODOS']
+
+    # inserts a user with a list of to-dos and logs them in through a server-side session
+    user = {'email': 'bench@email.com', 'name': 'bench', 'password': 'hash'}
+    users.insert(user)
+    for number in range(TODOS):
+        todos.insert({'content': f'bench {number}', 'degree': 'Important', 'done': False, 'user_id': user['_id'],
+                      'version': 1})
+    todo_id = todos.find_by_user(user['_id'])[0]['_id']
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = app.config['SESSION_STORE'].create(user)
+        session['_fresh'] = True
+
+    report('GET / (anonymous)', lambda: app.test_client().get('/'), requests)
+    report(f'GET / ({TODOS} to-dos)', lambda: client.get('/'), requests)
+    report('GET /profile', lambda: client.get('/profile'), requests)
+    report('POST /todo/<id>/update/', lambda: client.post(f'/todo/{todo_id}/update/', data={
+        'content': 'bench', 'degree': 'Unimportant'}), requests)
+    report('POST /todo/<id>/done/', lambda: client.post(f'/todo/{todo_id}/done/'), requests)
+    report('POST /todo/<id>/done/ (replayed key)', lambda: client.post(f'/todo/{todo_id}/done/', data={
+        'idempotency_key': 'bench'}), requests)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,153 @@
+"""
+This file defines the idempotency keys that make the app's write requests safe to retry.
+Forms carry a random key (the 'idempotency_key' field, or the 'Idempotency-Key' header for other clients)
+and the first request with a given key stores its response. Replays of that request, such as a double-submitted
+form or a retry from the load balancer, get the stored response back without executing the writes again.
+A key is reserved by a request for a short lease, so if its worker dies before storing the response,
+a retry made after the lease expires takes the key over instead of being rejected until the key expires.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import request, current_app, abort
+from flask_login import current_user
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+# response headers stored and replayed along with the status code and body
+HEADERS = ('Location', 'Content-Type')
+
+
+# new_key method generates a key for a form, it is available to the templates as idempotency_key()
+def new_key():  # no parameters needed
+    return uuid.uuid4().hex
+
+
+class MemoryIdempotencyStore:  # keys kept in the worker's memory, evicting the oldest ones
+    # instantiates store with keys' time to live, reservations' lease and its capacity
+    def __init__(self, ttl, lease, max_size=10000):
+        self.ttl = ttl  # timedelta after which a key expires
+        self.lease = lease  # timedelta after which an unfinished reservation can be taken over
+        self.max_size = max_size  # maximum number of keys kept
+        self.keys = OrderedDict()  # key -> (creation date, record), oldest first
+        self.lock = threading.Lock()  # keys are shared by the worker's request threads
+
+    # reserves an unused (or abandoned) key and returns None, otherwise returns the key's record
+    def reserve(self, key):
+        with self.lock:
+            now = datetime.utcnow()
+            while self.keys and next(iter(self.keys.values()))[0] < now - self.ttl:
+                self.keys.popitem(last=False)  # drops expired keys
+
+            if key in self.keys:
+                record = self.keys[key][1]
+                if 'status' in record or record['locked_until'] > now:  # completed or still being executed
+                    return dict(record)
+                record['locked_until'] = now + self.lease  # takes over abandoned reservation
+                return None
+
+            self.keys[key] = (now, {'locked_until': now + self.lease})
+            if len(self.keys) > self.max_size:
+                self.keys.popitem(last=False)  # evicts oldest key
+            return None
+
+    def complete(self, key, response):  # stores the response of the request that reserved the key
+        with self.lock:
+            if key in self.keys:
+                self.keys[key][1].update(response)
+
+    def release(self, key):  # frees the key, so the request can be retried
+        with self.lock:
+            self.keys.pop(key, None)
+
+
+class MongoIdempotencyStore:  # keys kept in a MongoDB collection shared by all workers
+    # instantiates store with the collection, keys' time to live and reservations' lease
+    def __init__(self, collection, ttl, lease):
+        self.collection = collection  # collection where keys are stored
+        self.ttl = ttl  # timedelta after which a key expires
+        self.lease = lease  # timedelta after which an unfinished reservation can be taken over
+        self.indexed = False  # whether the collection's TTL index has been created
+
+    # reserves an unused (or abandoned) key and returns None, otherwise returns the key's record
+    def reserve(self, key):
+        if not self.indexed:
+            # MongoDB deletes expired keys on its own through the TTL index, the time to live is stored
+            # in each key, so changing it does not conflict with the existing index
+            self.collection.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+            self.indexed = True
+
+        now = datetime.utcnow()
+        try:
+            # unique _id makes the reservation atomic across workers
+            self.collection.insert_one({'_id': key, 'created_at': now, 'expires_at': now + self.ttl,
+                                        'locked_until': now + self.lease})
+            return None
+        except DuplicateKeyError:
+            # takes over the key if its request never completed and its lease has expired, or if the key has
+            # expired but the TTL monitor (which only runs every minute) has not deleted it yet,
+            # filtering on the lease and expiration makes sure a single retry wins it
+            if self.collection.find_one_and_update(
+                    {'_id': key, '$or': [{'status': {'$exists': False}, 'locked_until': {'$lt': now}},
+                                         {'expires_at': {'$lt': now}}]},
+                    {'$set': {'created_at': now, 'expires_at': now + self.ttl, 'locked_until': now + self.lease},
+                     '$unset': {'status': '', 'headers': '', 'body': ''}}):
+                return None
+            return self.collection.find_one({'_id': key}) or {}
+
+    def complete(self, key, response):  # stores the response of the request that reserved the key
+        self.collection.update_one({'_id': key}, {'$set': response})
+
+    def release(self, key):  # frees the key, so the request can be retried
+        self.collection.delete_one({'_id': key})
+
+
+# create_store method instantiates the idempotency store selected by the app's settings
+def create_store(app, db):  # parameters app and db required
+    ttl = timedelta(seconds=app.config['IDEMPOTENCY_TTL'])
+    lease = timedelta(seconds=app.config['IDEMPOTENCY_LEASE'])
+    if app.config['IDEMPOTENCY_BACKEND'] == 'memory':
+        return MemoryIdempotencyStore(ttl, lease, app.config['IDEMPOTENCY_MAX_SIZE'])
+    elif app.config['IDEMPOTENCY_BACKEND'] == 'mongo':
+        return MongoIdempotencyStore(db.idempotency_keys, ttl, lease)
+    raise ValueError(f"Unknown idempotency backend: {app.config['IDEMPOTENCY_BACKEND']}")
+
+
+# idempotent decorator makes a view return the stored response when a request with the same key is replayed
+def idempotent(view):  # parameter view required
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+        # reads and requests without key are executed as usual
+        if request.method != 'POST' or not key or not current_user.is_authenticated:
+            return view(*args, **kwargs)
+
+        key = f'{current_user.id}:{request.path}:{key}'  # keys are scoped by user and URL
+        store = current_app.config['IDEMPOTENCY_STORE']
+        record = store.reserve(key)
+        if record is not None:  # key was already used
+            if 'status' not in record:  # original request is still being executed (its lease has not expired)
+                abort(409, description='A request with the same idempotency key is in progress.')
+            return current_app.response_class(record['body'], status=record['status'], headers=record['headers'])
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:  # failed requests (including aborted ones) can be retried
+            store.release(key)
+            raise
+
+        if response.status_code >= 500:  # server errors can be retried
+            store.release(key)
+        else:
+            store.complete(key, {
+                'status': response.status_code,
+                'headers': {name: response.headers[name] for name in HEADERS if name in response.headers},
+                'body': response.get_data(),
+            })
+        return response
+
+    return wrapper
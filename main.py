@@ -6,30 +6,43 @@ that may arise during the handling of the requests, as well as redirections.
 """
 
 from bson import ObjectId
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, render_template, request, redirect, url_for, abort, current_app
 from flask_login import login_required, current_user
+from werkzeug.local import LocalProxy
 
-from app import db
+from idempotency import idempotent
+
+# todos repository of the current app (see repositories.py)
+todos = LocalProxy(lambda: current_app.config['TODOS'])
 
 # creates blueprint for app's main routes
 main = Blueprint('main', __name__)
 
 
+# check_conflict method aborts with 409 if a versioned update did not happen because the todo has changed
+# in the meantime (optimistic concurrency control), updates of missing todos are ignored as before
+def check_conflict(todo_id, version, updated):  # parameters todo_id, version and updated required
+    if not updated and version is not None and todos.find_one(todo_id, current_user.id):
+        abort(409, description='This to-do has been changed in the meantime, reload the page and try again.')
+
+
 # index method displays list of 'todos' from database and allows for the
 # insertion of new ones
 @main.route('/', methods=('GET', 'POST'))  # accepts GET and POST requests at specified URL
+@idempotent  # replayed requests return the original response
 def index():  # no parameters needed
     if current_user.is_authenticated:  # if user is logged-in
         if request.method == 'POST':  # if request method is POST
             content = request.form.get('content')  # field 'content' from submitted form
             degree = request.form.get('degree')  # field 'degree' from submitted form
             # insert to database with fields from form
-            db.todos.insert_one({'content': content, 'degree': degree, 'done': False, 'user_id': current_user.id})
+            todos.insert({'content': content, 'degree': degree, 'done': False, 'user_id': current_user.id,
+                          'version': 1})
             return redirect(url_for('main.index'))  # redirect to home page
         else:  # if request method is GET
             # fetch all 'todos' created by the user from database
-            all_todos = db.todos.find({'user_id': current_user.id})
-            return render_template('index.html', todos=list(all_todos))  # renders home template with list of todos
+            all_todos = todos.find_by_user(current_user.id)
+            return render_template('index.html', todos=all_todos)  # renders home template with list of todos
     else:  # if user is not logged-in
         if request.method == 'POST':  # if request method is POST
             return redirect(url_for('auth.login'))  # redirects to login page
@@ -40,12 +53,15 @@ def index():  # no parameters needed
 # update method allows the user to change the details of existing todos
 @main.post('/todo/<todo_id>/update/')  # accepts POST requests at specified URL
 @login_required  # only logged-in users allowed
+@idempotent  # replayed requests return the original response
 def update(todo_id):  # parameter todo_id required
-    # update to database with fields from form
-    db.todos.update_one({"_id": ObjectId(todo_id)}, {"$set": {
+    version = request.form.get('version', type=int)  # field 'version' from submitted form
+    # update to database with fields from form, if the todo is still at the submitted version
+    updated = todos.update(ObjectId(todo_id), current_user.id, {
         "content": request.form.get('content'),  # field 'content' from submitted form
         "degree": request.form.get('degree'),  # field 'degree' from submitted form
-    }})
+    }, version)
+    check_conflict(ObjectId(todo_id), version, updated)
 
     return redirect(url_for('main.index'))  # redirects to home page
 
@@ -53,13 +69,12 @@ def update(todo_id):  # parameter todo_id required
 # done method allows the user to toggle existing todos' 'done' attribute
 @main.post('/todo/<todo_id>/done/')  # accepts POST requests at specified URL
 @login_required  # only logged-in users allowed
+@idempotent  # replayed requests return the original response, so the todo is not toggled twice
 def done(todo_id):  # parameter todo_id required
-    # fetch object from database by id
-    todo = db.todos.find_one({"_id": ObjectId(todo_id)})
-    # update to database toggling the 'done' attribute
-    db.todos.update_one({"_id": ObjectId(todo_id)}, {"$set": {
-        "done": not todo['done']
-    }})
+    version = request.form.get('version', type=int)  # field 'version' from submitted form
+    # update to database toggling the 'done' attribute, if the todo is still at the submitted version
+    updated = todos.toggle_done(ObjectId(todo_id), current_user.id, version)
+    check_conflict(ObjectId(todo_id), version, updated)
 
     return redirect(url_for('main.index'))  # redirects to home page
 
@@ -69,7 +84,7 @@ def done(todo_id):  # parameter todo_id required
 @login_required  # only logged-in users allowed
 def delete(todo_id):  # parameter todo_id required
     # delete object from database
-    db.todos.delete_one({"_id": ObjectId(todo_id)})
+    todos.delete(ObjectId(todo_id), current_user.id)
     return redirect(url_for('main.index'))  # redirects to home page
 
 
@@ -9,14 +9,22 @@ from flask_login import UserMixin
 
 
 class User(UserMixin):  # app's user
-    def __init__(self, user):  # instantiates User with details from JSON-like model from MongoDB
+    def __init__(self, user, session_id=None):  # instantiates User with details from JSON-like model from MongoDB
         self.id = ObjectId(user['_id'])  # user's id
         self.email = user['email']  # user's email
         self.name = user['name']  # user's name
-        self.password = user['password']  # user's password
+        self.password = user.get('password')  # user's password (not present in users loaded from a session)
+        self.session_id = session_id  # id of the server-side session the user was loaded from
+
+    def get_id(self):  # id stored by Flask-Login in the session and "remember me" cookies
+        # the session id is used instead of the user's id, so cookies can be revoked by deleting the session
+        if not self.session_id:  # a user without session could be logged in, but never loaded back
+            raise RuntimeError('User has no session, create one in the session store before logging it in')
+        return self.session_id
 
     """
-    The following properties are inherited from UserMixin as they are required by Flask-Login:
+    The following properties are inherited from UserMixin as they are required by Flask-Login
+    (get_id is overridden above):
     
     @property
     def is_active(self):
@@ -0,0 +1,192 @@
+"""
+This file defines the repositories through which the views access the app's data.
+Each entity has a repository backed by MongoDB and one backed by dictionaries in the worker's memory,
+which is fast, needs no network and keeps every app instance isolated (used by tests and benchmarks).
+Both return documents shaped like MongoDB's, so the views and templates do not depend on the backend.
+Documents are flat, so the memory backend hands out shallow copies, which keeps callers from altering its state.
+"""
+
+import threading
+
+from bson import ObjectId
+
+
+# copy method returns a shallow copy of a document, None if there is no document
+def copy(document):  # parameter document required
+    return dict(document) if document is not None else None
+
+
+# matches_version method tells whether a document is at the given version,
+# documents created before versioning have no 'version' field and are at version 0
+def matches_version(document, version):  # parameters document and version required
+    return version is None or document.get('version', 0) == version
+
+
+class MongoUserRepository:  # users kept in a MongoDB collection
+    def __init__(self, collection):  # instantiates repository with the users collection
+        self.collection = collection
+
+    def find_by_id(self, user_id):  # returns user with the given id, None if it does not exist
+        return self.collection.find_one({'_id': user_id})
+
+    def find_by_email(self, email):  # returns user with the given email, None if it does not exist
+        return self.collection.find_one({'email': email})
+
+    def count_by_email(self, email):  # returns number of users with the given email
+        return self.collection.count_documents({'email': email})
+
+    def insert(self, user):  # adds new user and returns its id
+        return self.collection.insert_one(user).inserted_id
+
+    def update(self, user_id, fields):  # sets the given fields of the user
+        self.collection.update_one({'_id': user_id}, {'$set': fields})
+
+    def delete(self, user_id):  # deletes user
+        self.collection.delete_one({'_id': user_id})
+
+
+class MongoTodoRepository:  # todos kept in a MongoDB collection
+    # every query includes 'user_id', the collection's shard key (see sharding.py),
+    # so it is routed to a single shard and users can only reach their own todos
+    def __init__(self, collection):  # instantiates repository with the todos collection
+        self.collection = collection
+
+    def find_by_user(self, user_id):  # returns all todos of the user, oldest first
+        return list(self.collection.find({'user_id': user_id}).sort('_id'))
+
+    def find_one(self, todo_id, user_id):  # returns the user's todo with the given id, None if it does not exist
+        return self.collection.find_one({'_id': todo_id, 'user_id': user_id})
+
+    def insert(self, todo):  # adds new todo and returns its id
+        return self.collection.insert_one(todo).inserted_id
+
+    # sets the given fields of the user's todo and bumps its version, only if it is at the given version
+    # (if any), returns whether the todo was updated
+    def update(self, todo_id, user_id, fields, version=None):
+        result = self.collection.update_one(self.query(todo_id, user_id, version), {
+            '$set': fields,
+            '$inc': {'version': 1},
+        })
+        return result.matched_count == 1
+
+    # toggles the 'done' attribute of the user's todo in a single round trip and bumps its version,
+    # only if it is at the given version (if any), returns whether the todo was updated
+    def toggle_done(self, todo_id, user_id, version=None):
+        result = self.collection.update_one(self.query(todo_id, user_id, version), [{'$set': {
+            'done': {'$not': '$done'},
+            'version': {'$add': [{'$ifNull': ['$version', 0]}, 1]},
+        }}])
+        return result.matched_count == 1
+
+    def delete(self, todo_id, user_id):  # deletes the user's todo
+        self.collection.delete_one({'_id': todo_id, 'user_id': user_id})
+
+    def delete_by_user(self, user_id):  # deletes all todos of the user
+        self.collection.delete_many({'user_id': user_id})
+
+    @staticmethod
+    def query(todo_id, user_id, version):  # builds the query matching the user's todo at the given version
+        query = {'_id': todo_id, 'user_id': user_id}
+        if version is not None:
+            query['version'] = version or None  # null also matches documents without 'version'
+        return query
+
+
+class MemoryUserRepository:  # users kept in the worker's memory
+    def __init__(self):  # instantiates empty repository
+        self.users = {}  # user id -> user
+        self.emails = {}  # email -> user id
+        self.lock = threading.Lock()  # users are shared by the worker's request threads
+
+    def find_by_id(self, user_id):  # returns user with the given id, None if it does not exist
+        with self.lock:
+            return copy(self.users.get(user_id))
+
+    def find_by_email(self, email):  # returns user with the given email, None if it does not exist
+        with self.lock:
+            return copy(self.users.get(self.emails.get(email)))
+
+    def count_by_email(self, email):  # returns number of users with the given email
+        with self.lock:
+            return sum(1 for user in self.users.values() if user['email'] == email)
+
+    def insert(self, user):  # adds new user and returns its id
+        user.setdefault('_id', ObjectId())  # sets the id on the given document, as pymongo does
+        with self.lock:
+            self.users[user['_id']] = copy(user)
+            self.emails[user['email']] = user['_id']
+        return user['_id']
+
+    def update(self, user_id, fields):  # sets the given fields of the user
+        with self.lock:
+            user = self.users.get(user_id)
+            if user:
+                if 'email' in fields:  # moves user to its new email in the index
+                    self.emails.pop(user['email'], None)
+                    self.emails[fields['email']] = user_id
+                user.update(fields)
+
+    def delete(self, user_id):  # deletes user
+        with self.lock:
+            user = self.users.pop(user_id, None)
+            if user:
+                self.emails.pop(user['email'], None)
+
+
+class MemoryTodoRepository:  # todos kept in the worker's memory
+    def __init__(self):  # instantiates empty repository
+        self.todos = {}  # user id -> {todo id -> todo}, kept in insertion (and therefore ObjectId) order
+        self.lock = threading.Lock()  # todos are shared by the worker's request threads
+
+    def find_by_user(self, user_id):  # returns all todos of the user, oldest first
+        with self.lock:
+            return [copy(todo) for todo in self.todos.get(user_id, {}).values()]
+
+    def find_one(self, todo_id, user_id):  # returns the user's todo with the given id, None if it does not exist
+        with self.lock:
+            return copy(self.todos.get(user_id, {}).get(todo_id))
+
+    def insert(self, todo):  # adds new todo and returns its id
+        todo.setdefault('_id', ObjectId())  # sets the id on the given document, as pymongo does
+        with self.lock:
+            self.todos.setdefault(todo['user_id'], {})[todo['_id']] = copy(todo)
+        return todo['_id']
+
+    # sets the given fields of the user's todo and bumps its version, only if it is at the given version
+    # (if any), returns whether the todo was updated
+    def update(self, todo_id, user_id, fields, version=None):
+        with self.lock:  # version check and update happen atomically, as in MongoDB's update_one
+            todo = self.todos.get(user_id, {}).get(todo_id)
+            if todo is None or not matches_version(todo, version):
+                return False
+            todo.update(fields)
+            todo['version'] = todo.get('version', 0) + 1
+            return True
+
+    # toggles the 'done' attribute of the user's todo and bumps its version,
+    # only if it is at the given version (if any), returns whether the todo was updated
+    def toggle_done(self, todo_id, user_id, version=None):
+        with self.lock:
+            todo = self.todos.get(user_id, {}).get(todo_id)
+            if todo is None or not matches_version(todo, version):
+                return False
+            todo['done'] = not todo['done']
+            todo['version'] = todo.get('version', 0) + 1
+            return True
+
+    def delete(self, todo_id, user_id):  # deletes the user's todo
+        with self.lock:
+            self.todos.get(user_id, {}).pop(todo_id, None)
+
+    def delete_by_user(self, user_id):  # deletes all todos of the user
+        with self.lock:
+            self.todos.pop(user_id, None)
+
+
+# create_repositories method instantiates the users and todos repositories selected by the app's settings
+def create_repositories(app, db):  # parameters app and db required
+    if app.config['REPOSITORY_BACKEND'] == 'memory':
+        return MemoryUserRepository(), MemoryTodoRepository()
+    elif app.config['REPOSITORY_BACKEND'] == 'mongo':
+        return MongoUserRepository(db.users), MongoTodoRepository(db.todos)
+    raise ValueError(f"Unknown repository backend: {app.config['REPOSITORY_BACKEND']}")
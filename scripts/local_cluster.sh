@@ -0,0 +1,66 @@
+#!/usr/bin/env bash
+# Starts (or stops) a local sharded MongoDB cluster for testing and benchmarking:
+# one config server, <shards> single-member shard replica sets and a mongos router on <port>.
+# Requires mongod, mongos and mongosh on the PATH.
+#
+#   scripts/local_cluster.sh start <shards> [port]   # then use MONGODB_URI='mongodb://localhost:<port>'
+#   scripts/local_cluster.sh stop [port]
+
+set -euo pipefail
+
+command=${1:?usage: $0 start <shards> [port] | stop [port]}
+
+# wait_primary method blocks until the replica set member listening on the given port is writable
+wait_primary() {
+    until mongosh --port "$1" --quiet --eval 'db.hello().isWritablePrimary' | grep -q true; do
+        sleep 0.5
+    done
+}
+
+# start_replset method starts a single-member replica set with the given name, port and role flag
+start_replset() {
+    mkdir -p "$dir/$1"
+    mongod "$3" --replSet "$1" --port "$2" --dbpath "$dir/$1" --bind_ip localhost \
+        --fork --logpath "$dir/$1.log" --pidfilepath "$dir/$1.pid" > /dev/null
+    mongosh --port "$2" --quiet --eval \
+        "rs.initiate({_id: '$1', members: [{_id: 0, host: 'localhost:$2'}]})" > /dev/null
+    wait_primary "$2"
+}
+
+case $command in
+    start)
+        shards=${2:?usage: $0 start <shards> [port]}
+        port=${3:-27017}
+        dir=${CLUSTER_DIR:-/tmp/dorsettodo-cluster-$port}
+        mkdir -p "$dir"
+
+        start_replset cfg $((port + 1)) --configsvr
+        for ((i = 0; i < shards; i++)); do
+            start_replset "shard$i" $((port + 2 + i)) --shardsvr
+        done
+
+        mongos --configdb "cfg/localhost:$((port + 1))" --port "$port" --bind_ip localhost \
+            --fork --logpath "$dir/mongos.log" --pidfilepath "$dir/mongos.pid" > /dev/null
+        for ((i = 0; i < shards; i++)); do
+            mongosh --port "$port" --quiet --eval "sh.addShard('shard$i/localhost:$((port + 2 + i))')" > /dev/null
+        done
+        echo "mongos listening on localhost:$port with $shards shard(s), data in $dir"
+        ;;
+    stop)
+        port=${2:-27017}
+        dir=${CLUSTER_DIR:-/tmp/dorsettodo-cluster-$port}
+        # stops the router first, then the shards and the config server
+        for pidfile in "$dir"/mongos.pid "$dir"/shard*.pid "$dir"/cfg.pid; do
+            if [[ -f $pidfile ]]; then
+                pid=$(cat "$pidfile")
+                kill "$pid" 2> /dev/null || true
+                while kill -0 "$pid" 2> /dev/null; do sleep 0.2; done
+            fi
+        done
+        rm -rf "$dir"
+        ;;
+    *)
+        echo "usage: $0 start <shards> [port] | stop [port]" >&2
+        exit 1
+        ;;
+esac
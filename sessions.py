@@ -0,0 +1,121 @@
+"""
+This file defines the server-side session stores used to authenticate users.
+Each logged-in browser holds a random session id (inside Flask-Login's session and "remember me" cookies)
+that maps to an entry in the store containing the user's projected fields. Loading the current user costs
+a single lookup in the store and deleting the entries revokes the cookies that point to them.
+"""
+
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+
+# user fields kept in the session, the password hash never leaves the users collection
+PROJECTION = ('_id', 'email', 'name')
+
+
+# project method keeps only the fields of a user document that are stored in the session
+def project(user):  # parameter user required
+    return {field: user[field] for field in PROJECTION}
+
+
+class MemorySessionStore:  # sessions kept in the worker's memory, evicting the least recently used ones
+    # instantiates store with the lifetimes of sessions with and without "remember me" and its capacity
+    def __init__(self, lifetime, remember_lifetime, max_size=10000):
+        self.lifetime = lifetime  # timedelta after which a session expires
+        self.remember_lifetime = remember_lifetime  # timedelta after which a "remember me" session expires
+        self.max_size = max_size  # maximum number of sessions kept
+        self.sessions = OrderedDict()  # session id -> (expiration date, user id, projected user)
+        self.users = {}  # user id -> set of session ids
+        self.lock = threading.Lock()  # sessions are shared by the worker's request threads
+
+    def create(self, user, remember=False):  # stores a new session for the user and returns its id
+        session_id = secrets.token_urlsafe(32)
+        expires_at = datetime.utcnow() + (self.remember_lifetime if remember else self.lifetime)
+        with self.lock:
+            self.sessions[session_id] = (expires_at, user['_id'], project(user))
+            self.users.setdefault(user['_id'], set()).add(session_id)
+            if len(self.sessions) > self.max_size:
+                self.remove(next(iter(self.sessions)))  # evicts least recently used session
+        return session_id
+
+    def get(self, session_id):  # returns the projected user of a valid session, None otherwise
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] < datetime.utcnow():  # session has expired
+                self.remove(session_id)
+                return None
+            self.sessions.move_to_end(session_id)  # marks session as recently used
+            return entry[2]
+
+    def revoke(self, session_id):  # deletes a single session
+        with self.lock:
+            self.remove(session_id)
+
+    def revoke_user(self, user_id):  # deletes every session of the user
+        with self.lock:
+            for session_id in self.users.pop(user_id, set()):
+                del self.sessions[session_id]
+
+    def remove(self, session_id):  # deletes a session and its entry in the user's index, lock must be held
+        entry = self.sessions.pop(session_id, None)
+        if entry:
+            session_ids = self.users[entry[1]]
+            session_ids.discard(session_id)
+            if not session_ids:
+                del self.users[entry[1]]
+
+
+class MongoSessionStore:  # sessions kept in a MongoDB collection shared by all workers
+    # instantiates store with the collection and the lifetimes of sessions with and without "remember me"
+    def __init__(self, collection, lifetime, remember_lifetime):
+        self.collection = collection  # collection where sessions are stored
+        self.lifetime = lifetime  # timedelta after which a session expires
+        self.remember_lifetime = remember_lifetime  # timedelta after which a "remember me" session expires
+        self.indexed = False  # whether the collection's indexes have been created
+
+    def create(self, user, remember=False):  # stores a new session for the user and returns its id
+        if not self.indexed:
+            # MongoDB deletes expired sessions on its own through the TTL index
+            self.collection.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+            self.collection.create_index([('user_id', ASCENDING)])
+            self.indexed = True
+
+        session_id = secrets.token_urlsafe(32)
+        self.collection.insert_one({
+            '_id': session_id,
+            'user_id': user['_id'],
+            'user': project(user),
+            'expires_at': datetime.utcnow() + (self.remember_lifetime if remember else self.lifetime),
+        })
+        return session_id
+
+    def get(self, session_id):  # returns the projected user of a valid session, None otherwise
+        # the TTL monitor only runs every minute, so expiration is also checked by the query
+        session = self.collection.find_one({'_id': session_id, 'expires_at': {'$gt': datetime.utcnow()}},
+                                           {'user': True})
+        if session:
+            return session['user']
+
+    def revoke(self, session_id):  # deletes a single session
+        self.collection.delete_one({'_id': session_id})
+
+    def revoke_user(self, user_id):  # deletes every session of the user
+        self.collection.delete_many({'user_id': user_id})
+
+
+# create_store method instantiates the session store selected by the app's settings
+def create_store(app, db):  # parameters app and db required
+    lifetime = timedelta(seconds=app.config['SESSION_LIFETIME'])  # logins without "remember me"
+    remember_lifetime = app.config.get('REMEMBER_COOKIE_DURATION', timedelta(days=365))  # matches the cookie
+    if not isinstance(remember_lifetime, timedelta):  # Flask-Login also accepts the duration in seconds
+        remember_lifetime = timedelta(seconds=remember_lifetime)
+    if app.config['SESSION_BACKEND'] == 'memory':
+        return MemorySessionStore(lifetime, remember_lifetime, app.config['SESSION_MAX_SIZE'])
+    elif app.config['SESSION_BACKEND'] == 'mongo':
+        return MongoSessionStore(db.sessions, lifetime, remember_lifetime)
+    raise ValueError(f"Unknown session backend: {app.config['SESSION_BACKEND']}")
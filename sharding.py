@@ -0,0 +1,34 @@
+"""
+This file defines how the todos collection is distributed across the shards of a MongoDB cluster.
+Todos are sharded by the id of the user who owns them, which every query in repositories.py includes,
+so mongos routes each request to the single shard holding that user's todos instead of broadcasting it.
+Run it against a mongos router to shard the collection:
+
+    MONGODB_URI='mongodb://localhost:27017' TODOS_SHARD_KEY='hashed' python sharding.py
+"""
+
+import os
+
+from pymongo import MongoClient
+
+# shard keys that can be configured for the todos collection:
+# - hashed: users are spread evenly across the shards, even though their ObjectIds grow monotonically,
+#   and the todos of a single user stay sorted by their own ObjectId inside the user's range
+# - ranged: consecutive users are kept together, which suits zone sharding, but new users all land on
+#   the last chunk until the balancer splits and moves it
+SHARD_KEYS = {
+    'hashed': {'user_id': 'hashed', '_id': 1},
+    'ranged': {'user_id': 1, '_id': 1},
+}
+
+
+# shard_todos method enables sharding for the database and shards its todos collection
+def shard_todos(client, db_name='flask_db', kind='hashed'):  # parameter client required
+    key = SHARD_KEYS[kind]  # raises KeyError for unknown kinds of shard key
+    client.admin.command('enableSharding', db_name)
+    client[db_name].todos.create_index(list(key.items()))  # shard key must be backed by an index
+    client.admin.command('shardCollection', f'{db_name}.todos', key=key)
+
+
+if __name__ == '__main__':
+    shard_todos(MongoClient(os.getenv('MONGODB_URI')), kind=os.getenv('TODOS_SHARD_KEY', 'hashed'))
@@ -1,9 +1,10 @@
 // editItem function toggles form at main page between "add new item" and "update item details"
-function editItem(url, content = null, degree = null) {
+function editItem(url, content = null, degree = null, version = null) {
     if (content && degree) {
         document.getElementById('main-form').action = url;
         document.getElementById('main-title').textContent = 'Update Item';
         document.getElementById('main-content').value = content;
+        document.getElementById('main-version').value = version;
 
         if (degree === 'Important') document.getElementById('main-important').checked = true;
         else document.getElementById('main-unimportant').checked = true;
@@ -19,6 +20,7 @@ function editItem(url, content = null, degree = null) {
     } else {
         document.getElementById('main-form').action = url;
         document.getElementById('main-title').textContent = 'New Item';
+        document.getElementById('main-version').value = '';
         document.getElementById('main-important').checked = false;
         document.getElementById('main-unimportant').checked = false;
         document.getElementById('main-submit').innerText = 'Add'
@@ -1,19 +1,29 @@
 """
 This file defines the test settings for the project.
 Tests are run using the pytest framework and library.
+Every test class runs once against each repository backend: 'memory', which needs no database,
+and 'mongo', which runs against the database at MONGODB_URI and is skipped if it is not set.
 """
 
+import os
+
 import pytest
 
 from app import create_app
 
 
-@pytest.fixture()  # marks method as a fixture that can be reused by various test cases
-def app():  # instance of app to be tested
-    app = create_app()  # instantiates a test app with same settings as the regular app
-    # add the TESTING flag to this instance
-    app.config.update({
+# marks method as a fixture that can be reused by various test cases, shared by the test cases of a class
+# and instantiated once per repository backend
+@pytest.fixture(scope='class', params=['memory', 'mongo'])
+def app(request):  # instance of app to be tested
+    if request.param == 'mongo' and not os.getenv('MONGODB_URI'):
+        pytest.skip('MONGODB_URI is not set')
+
+    # instantiates a test app with same settings as the regular app, plus
+    # the TESTING flag and the repository backend being tested
+    app = create_app({
         "TESTING": True,
+        "REPOSITORY_BACKEND": request.param,
     })
 
     # other setup can go here, if necessary
@@ -23,6 +33,24 @@ def app():  # instance of app to be tested
     # clean up / reset resources here, if necessary
 
 
+@pytest.fixture(scope='class')  # marks method as a fixture that can be reused by various test cases of a class
+def users(app):  # users repository of the app being tested
+    return app.config['USERS']
+
+
+@pytest.fixture(scope='class')  # marks method as a fixture that can be reused by various test cases of a class
+def todos(app):  # todos repository of the app being tested
+    return app.config['TODOS']
+
+
+# marks method as a fixture that can be reused by various test cases of a class
+@pytest.fixture(scope='class')
+def email(request):  # dummy email for testing, unique to the test class and the pytest-xdist worker running it
+    # classes run in parallel share the database at MONGODB_URI, so each one needs users of its own
+    worker = os.getenv('PYTEST_XDIST_WORKER', 'main')
+    return f'{request.cls.__name__.lower()}_{worker}@pytest.com'
+
+
 @pytest.fixture()  # marks method as a fixture that can be reused by various test cases
 def client(app):  # defines a client for simulating HTTP requests
     return app.test_client()  # returns client
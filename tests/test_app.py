@@ -0,0 +1,42 @@
+"""
+This file defines tests for the app's factory.
+Each test is a function that instantiates the app and evaluates its state
+against a pre-defined assertion. If the assertion is correct, the test has passed.
+If the assertion is incorrect, the test has failed.
+"""
+
+import logging
+import time
+
+from pymongo import MongoClient
+
+import app as app_module
+from app import create_app
+
+
+class TestCreateApp:  # app factory test suite
+    # warmup should compile every template ahead of the first request
+    def test_warmup_compiles_templates(self):
+        app = create_app({'TESTING': True, 'WARMUP': True, 'REPOSITORY_BACKEND': 'memory'})
+        cached = {key[1] for key in app.jinja_env.cache.keys()}  # names of the templates in Jinja's cache
+        for name in ('base.html', 'index.html', 'login.html', 'signup.html', 'profile.html'):
+            assert name in cached  # expects template to have been compiled
+
+    # app without warmup should compile templates only when they are first rendered
+    def test_no_warmup(self):
+        app = create_app({'TESTING': True, 'WARMUP': False, 'REPOSITORY_BACKEND': 'memory'})
+        assert len(app.jinja_env.cache) == 0  # expects no template to have been compiled
+
+    # warmup should give up quickly on an unreachable MongoDB and log a warning
+    def test_warmup_unreachable_mongo(self, monkeypatch, caplog):
+        # points the warmup at an unroutable address (TEST-NET-1), whatever MONGODB_URI is set to
+        unreachable = MongoClient('mongodb://192.0.2.1', connect=False)
+        monkeypatch.setattr(app_module, 'client', unreachable)
+
+        start = time.perf_counter()
+        with caplog.at_level(logging.WARNING):
+            create_app({'TESTING': True, 'WARMUP': True, 'MONGODB_PREWARM': True, 'MONGODB_PREWARM_TIMEOUT': 0.5,
+                        'REPOSITORY_BACKEND': 'memory'})
+        unreachable.close()
+        assert time.perf_counter() - start < 5  # expects warmup not to wait for the default 30s timeout
+        assert 'MongoDB is unreachable' in caplog.text  # expects warning to have been logged
@@ -0,0 +1,68 @@
+"""
+This file defines tests for the idempotency keys of the app.
+Each test is a function that interacts with an idempotency key store and evaluates the result
+against a pre-defined assertion. If the assertion is correct, the test has passed.
+If the assertion is incorrect, the test has failed.
+"""
+
+import threading
+from datetime import timedelta
+
+from idempotency import MemoryIdempotencyStore
+
+
+class TestMemoryIdempotencyStore:  # in-memory idempotency key store test suite
+    key = 'pytest'  # dummy key for testing
+
+    # reserving a key held by a request still being executed should return its unfinished record
+    def test_reserve_running(self):
+        store = MemoryIdempotencyStore(timedelta(days=1), timedelta(minutes=1))
+        assert store.reserve(self.key) is None  # expects key to have been reserved
+        assert 'status' not in store.reserve(self.key)  # expects unfinished record
+
+    # reserving a completed key should return its stored response
+    def test_reserve_completed(self):
+        store = MemoryIdempotencyStore(timedelta(days=1), timedelta(minutes=1))
+        store.reserve(self.key)
+        store.complete(self.key, {'status': 302, 'headers': {'Location': '/'}, 'body': b''})
+        assert store.reserve(self.key)['status'] == 302  # expects stored response
+
+    # reserving a key abandoned by a request that never completed should take it over once its lease expires
+    def test_reserve_abandoned(self):
+        store = MemoryIdempotencyStore(timedelta(days=1), timedelta(seconds=-1))
+        store.reserve(self.key)  # reservation whose lease has already expired
+        assert store.reserve(self.key) is None  # expects key to have been taken over
+
+    # keys should expire after their time to live
+    def test_expiry(self):
+        store = MemoryIdempotencyStore(timedelta(seconds=-1), timedelta(minutes=1))
+        store.reserve(self.key)
+        store.complete(self.key, {'status': 302, 'headers': {}, 'body': b''})
+        assert store.reserve(self.key) is None  # expects expired key to be reserved again
+
+    # oldest key should be evicted when the store is full
+    def test_eviction(self):
+        store = MemoryIdempotencyStore(timedelta(days=1), timedelta(minutes=1), max_size=2)
+        for key in ('first', 'second', 'third'):
+            store.reserve(key)
+            store.complete(key, {'status': 302, 'headers': {}, 'body': b''})
+        assert store.reserve('first') is None  # expects it to have been evicted (and reserved again)
+        assert store.reserve('third')['status'] == 302  # expects it NOT to have been evicted
+
+    # a key reserved by many threads at once should be granted to only one of them
+    def test_reserve_concurrently(self):
+        store = MemoryIdempotencyStore(timedelta(days=1), timedelta(minutes=1))
+        barrier = threading.Barrier(8)  # starts all threads at the same time
+        results = []
+
+        def reserve(key):  # reserves the key and records whether it was granted
+            barrier.wait()
+            results.append(store.reserve(key) is None)
+
+        for number in range(50):
+            threads = [threading.Thread(target=reserve, args=(f'{self.key}{number}',)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert results.count(True) == 50  # expects each key to have been granted once
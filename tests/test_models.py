@@ -7,31 +7,35 @@ Each test tests only one parameter of the model, for this reason, tests are grou
 together into classes. Each class represents a suite of tests for a particular model.
 """
 
+import pytest
 from werkzeug.security import generate_password_hash
 
-from app import db
 from models import User
 
 
 class TestUserModel:  # user model test suite
     user = None  # user model to be used in all test cases
-    email = 'pytest@email.com'  # dummy email for testing
+    email = None  # dummy email for testing, unique to the class (see conftest.py)
     name = 'pytest'  # dummy name for testing
     password = 'pytest123'  # dummy password for testing
 
+    @pytest.fixture(scope='class', autouse=True)  # runs once per class (and repository backend)
     @classmethod
-    def setup_class(cls):  # prepares parameters that will be shared by the test cases
+    def mock_data(cls, app, users, email):  # prepares parameters that will be shared by the test cases
+        cls.email = email
         # inserts mock user to the database
-        db.users.insert_one({
+        users.insert({
             'email': cls.email,
             'name': cls.name,
             'password': generate_password_hash(cls.password, method='sha256')
         })
-        cls.user = User(db.users.find_one({'email': cls.email}))  # fetches mock user from the database
+        user = users.find_by_email(cls.email)  # fetches mock user from the database
+        cls.user = User(user, app.config['SESSION_STORE'].create(user))  # logs it in through a new session
 
-    @classmethod
-    def teardown_class(cls):  # clean up/reset resources previously created after all test cases are finished
-        db.users.delete_one({"_id": cls.user.id})  # deletes mock user from the database
+        yield  # runs the test cases
+
+        # clean up/reset resources previously created after all test cases are finished
+        users.delete(cls.user.id)  # deletes mock user from the database
 
     def test_is_active(self):  # instantiated user should be active
         assert self.user.is_active is True  # expects it to be true
@@ -42,5 +46,9 @@ class TestUserModel:  # user model test suite
     def test_is_anonymous(self):  # instantiated user should not be anonymous
         assert self.user.is_anonymous is False  # expects it to be false
 
-    def test_get_id(self):  # instantiated user should correctly return its id string
-        assert self.user.get_id() == str(self.user.id)  # expects it to be the same
+    def test_get_id(self):  # instantiated user should correctly return its session id
+        assert self.user.get_id() == self.user.session_id  # expects it to be the same
+
+    def test_get_id_without_session(self):  # user without session should not be able to be logged in
+        with pytest.raises(RuntimeError):  # expects it to fail
+            User({'_id': self.user.id, 'email': self.email, 'name': self.name}).get_id()
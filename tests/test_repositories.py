@@ -0,0 +1,68 @@
+"""
+This file defines tests for the in-memory repositories of the app.
+Each test is a function that interacts with a repository and evaluates the result
+against a pre-defined assertion. If the assertion is correct, the test has passed.
+If the assertion is incorrect, the test has failed.
+"""
+
+import sys
+import threading
+
+from repositories import MemoryUserRepository, MemoryTodoRepository
+
+
+# run_concurrently method calls target from many threads started at the same time,
+# switching between them as often as possible so their read-modify-write sections interleave
+def run_concurrently(target, count=8):  # parameter target required
+    barrier = threading.Barrier(count)
+
+    def wait_and_run(number):
+        barrier.wait()
+        target(number)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=wait_and_run, args=(number,)) for number in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+
+class TestMemoryUserRepository:  # in-memory users repository test suite
+    email = 'pytest@email.com'  # dummy email for testing
+
+    # a user's email changed by many threads at once should leave a single entry in the email index
+    def test_update_email_concurrently(self):
+        users = MemoryUserRepository()
+        user_id = users.insert({'email': self.email, 'name': 'pytest'})
+        errors = []
+
+        def update(number):  # changes the user's email and records any error raised
+            try:
+                users.update(user_id, {'email': f'{number}_{self.email}'})
+            except Exception as error:
+                errors.append(error)
+
+        for _ in range(200):
+            run_concurrently(update)
+        assert not errors  # expects no update to have failed
+        assert list(users.emails.values()) == [user_id]  # expects a single email to point to the user
+        assert users.find_by_email(users.find_by_id(user_id)['email'])['_id'] == user_id  # expects index to match
+
+
+class TestMemoryTodoRepository:  # in-memory todos repository test suite
+    user_id = 'pytest'  # dummy user id for testing
+
+    # a todo updated at the same version by many threads at once should be updated by only one of them
+    def test_update_concurrently(self):
+        todos = MemoryTodoRepository()
+        results = []
+
+        for _ in range(200):
+            todo_id = todos.insert({'user_id': self.user_id, 'content': 'pytest', 'degree': 'pytest', 'done': False})
+            run_concurrently(lambda number: results.append(todos.toggle_done(todo_id, self.user_id, 0)))
+        assert results.count(True) == 200  # expects each todo to have been updated once
@@ -0,0 +1,148 @@
+"""
+This file defines tests for the server-side sessions of the app.
+Each test is a function that logs users in and out through the app's views, or interacts with a session store,
+and evaluates the result against a pre-defined assertion. If the assertion is correct, the test has passed.
+If the assertion is incorrect, the test has failed.
+Unlike the view tests, users are logged in through the login view, so every request loads them from the store.
+"""
+
+import threading
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+from flask import url_for
+from flask_login.config import COOKIE_NAME
+from werkzeug.security import generate_password_hash
+
+from sessions import MemorySessionStore
+
+
+class TestSessionViews:  # session revocation test suite
+    email = None  # dummy email for testing, unique to the class (see conftest.py)
+    name = 'pytest'  # dummy name for testing
+    password = 'pytest123'  # dummy password for testing
+
+    @pytest.fixture(autouse=True)  # runs for every test case
+    def user_id(self, users, email):  # inserts mock user to the database and returns its id
+        self.email = email
+        user_id = users.insert({
+            'email': self.email,
+            'name': self.name,
+            'password': generate_password_hash(self.password, method='sha256')
+        })
+
+        yield user_id  # runs the test case
+
+        users.delete(user_id)  # deletes mock user from the database
+
+    @staticmethod
+    def url(app, endpoint, **values):  # builds the URL of a view
+        # the context is left before any request is sent, otherwise the requests would reuse its app context
+        # and share the user cached by Flask-Login in g instead of loading it from the session store
+        with app.test_request_context():
+            return url_for(endpoint, **values)
+
+    def login(self, app, remember=False):  # returns a new client logged in as the mock user and its login response
+        client = app.test_client()
+        data = {'email': self.email, 'password': self.password}
+        if remember:
+            data['remember'] = 'on'
+        response = client.post(self.url(app, 'auth.login'), data=data)
+        assert response.location == self.url(app, 'main.index')  # expects login to have succeeded
+        return client, response
+
+    # GET to profile with only a "remember me" cookie should log the user in, until they log out
+    def test_logout_revokes_remember_cookie(self, app):
+        client, response = self.login(app, remember=True)
+        # fetches "remember me" cookie set by the login view
+        cookie = next(header.split(';')[0] for header in response.headers.getlist('Set-Cookie')
+                      if header.startswith(f'{COOKIE_NAME}='))
+
+        # replays the cookie from a client without session (nor cookie jar, which would replace the header)
+        profile = self.url(app, 'main.profile')
+        response = app.test_client(use_cookies=False).get(profile, headers={'Cookie': cookie})
+        assert response.status_code == 200  # expects user to have been logged in
+
+        client.get(self.url(app, 'auth.logout'))  # logs user out
+        response = app.test_client(use_cookies=False).get(profile, headers={'Cookie': cookie})
+        assert response.status_code == 302  # expects user NOT to have been logged in
+        assert response.location.startswith(self.url(app, 'auth.login'))  # expects redirection to login page
+
+    # POST to 'update' should log the user out of every other client
+    def test_update_revokes_other_sessions(self, app, user_id):
+        profile = self.url(app, 'main.profile')
+        client, _ = self.login(app)
+        other_client, _ = self.login(app)
+        assert other_client.get(profile).status_code == 200  # expects other client to be logged in
+
+        client.post(self.url(app, 'auth.update', user_id=user_id),
+                    data={'email': self.email, 'name': 'new_pytest', 'password': 'new_pytest123'})
+        assert other_client.get(profile).status_code == 302  # expects other client to have been logged out
+        response = client.get(profile)  # expects client to remain logged in with the updated details
+        assert response.status_code == 200 and 'new_pytest' in response.text
+
+    # POST to 'delete' should log the user out of every other client
+    def test_delete_revokes_other_sessions(self, app, user_id):
+        profile = self.url(app, 'main.profile')
+        client, _ = self.login(app)
+        other_client, _ = self.login(app)
+        assert other_client.get(profile).status_code == 200  # expects other client to be logged in
+
+        client.post(self.url(app, 'auth.delete', user_id=user_id))
+        assert other_client.get(profile).status_code == 302  # expects other client to have been logged out
+        assert client.get(profile).status_code == 302  # expects client to have been logged out
+
+
+class TestMemorySessionStore:  # in-memory session store test suite
+    user = {'_id': ObjectId(), 'email': 'pytest@email.com', 'name': 'pytest', 'password': 'hash'}  # dummy user
+
+    # sessions should only hold the projected user fields
+    def test_get(self):
+        store = MemorySessionStore(timedelta(hours=1), timedelta(days=1))
+        session_id = store.create(self.user)
+        assert store.get(session_id) == {'_id': self.user['_id'], 'email': 'pytest@email.com', 'name': 'pytest'}
+
+    # sessions should expire after their lifetime, which depends on "remember me"
+    def test_expiry(self):
+        store = MemorySessionStore(timedelta(seconds=-1), timedelta(days=1))
+        assert store.get(store.create(self.user)) is None  # expects session to have expired
+        assert store.get(store.create(self.user, remember=True)) is not None  # expects it NOT to have expired
+
+    # least recently used session should be evicted when the store is full
+    def test_eviction(self):
+        store = MemorySessionStore(timedelta(hours=1), timedelta(days=1), max_size=2)
+        first = store.create(self.user)
+        second = store.create(self.user)
+        store.get(first)  # marks first session as recently used
+        third = store.create(self.user)
+        assert store.get(second) is None  # expects it to have been evicted
+        assert store.get(first) is not None and store.get(third) is not None  # expects them NOT to have been evicted
+
+    # revoking a user should delete all their sessions only
+    def test_revoke_user(self):
+        store = MemorySessionStore(timedelta(hours=1), timedelta(days=1))
+        other_user = dict(self.user, _id=ObjectId())
+        session_ids = [store.create(self.user) for _ in range(3)]
+        other_session_id = store.create(other_user)
+        store.revoke_user(self.user['_id'])
+        assert all(store.get(session_id) is None for session_id in session_ids)  # expects them to have been deleted
+        assert store.get(other_session_id) is not None  # expects it NOT to have been deleted
+
+    # revoking a user while other threads use the store should not fail
+    def test_revoke_user_concurrently(self):
+        store = MemorySessionStore(timedelta(hours=1), timedelta(days=1), max_size=100)
+        stop = threading.Event()
+
+        def use_store():  # creates and loads sessions until stopped
+            while not stop.is_set():
+                store.get(store.create(self.user))
+
+        thread = threading.Thread(target=use_store)
+        thread.start()
+        try:
+            for _ in range(200):
+                store.revoke_user(self.user['_id'])  # expects it not to raise
+        finally:
+            stop.set()
+            thread.join()
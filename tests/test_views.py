@@ -7,17 +7,19 @@ Each test tests only one functionality of the view, for this reason, tests are g
 together into classes. Each class represents a suite of tests for a particular view.
 """
 
+from datetime import timedelta
+
+import pytest
 from flask import url_for
 from flask_login import login_user
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from app import db
 from models import User
 
 
 class TestMainView:  # main view test suite
     user = None  # user model to be used in all test cases
-    email = 'pytest@email.com'  # dummy email for testing
+    email = None  # dummy email for testing, unique to the class (see conftest.py)
     name = 'pytest'  # dummy name for testing
     password = 'pytest123'  # dummy password for testing
 
@@ -27,29 +29,33 @@ class TestMainView:  # main view test suite
     content_updated = 'pytest to-do later'  # dummy updated content for testing
     degree_updated = 'Unimportant'  # dummy updated degree for testing
 
+    @pytest.fixture(scope='class', autouse=True)  # runs once per class (and repository backend)
     @classmethod
-    def setup_class(cls):  # prepares parameters that will be shared by the test cases
+    def mock_data(cls, app, users, todos, email):  # prepares parameters that will be shared by the test cases
+        cls.email = email
         # inserts mock user to the database
-        db.users.insert_one({
+        users.insert({
             'email': cls.email,
             'name': cls.name,
             'password': generate_password_hash(cls.password, method='sha256')
         })
-        cls.user = User(db.users.find_one({'email': cls.email}))  # fetches mock user from the database
+        user = users.find_by_email(cls.email)  # fetches mock user from the database
+        cls.user = User(user, app.config['SESSION_STORE'].create(user))  # logs it in through a new session
 
         # inserts mock to-do to the database
-        db.todos.insert_one({
+        todos.insert({
             'content': cls.content,
             'degree': cls.degree,
             'done': False,
             'user_id': cls.user.id
         })
-        cls.todo = db.todos.find_one({'user_id': cls.user.id})  # fetches mock to-do from the database
+        cls.todo = todos.find_by_user(cls.user.id)[0]  # fetches mock to-do from the database
 
-    @classmethod
-    def teardown_class(cls):  # clean up/reset resources previously created after all test cases are finished
-        db.users.delete_one({"_id": cls.user.id})  # deletes mock user from the database
-        db.todos.delete_many({"user_id": cls.user.id})  # deletes all mock to-dos from the database
+        yield  # runs the test cases
+
+        # clean up/reset resources previously created after all test cases are finished
+        users.delete(cls.user.id)  # deletes mock user from the database
+        todos.delete_by_user(cls.user.id)  # deletes all mock to-dos from the database
 
     # unauthenticated GET to index should NOT display list of to-dos
     def test_get_index_unauthenticated(self, client, context):
@@ -69,7 +75,7 @@ class TestMainView:  # main view test suite
             assert '<h3 class="title">Dorset To-Do List' in response.text  # expects correct template to be rendered
 
     # unauthenticated POST to index should NOT add new to-do
-    def test_post_index_unauthenticated(self, client, context):
+    def test_post_index_unauthenticated(self, client, context, todos):
         with context:
             # sends POST request to view with form
             response = client.post(url_for('main.index'), data={'content': self.content, 'degree': self.degree},
@@ -77,10 +83,10 @@ class TestMainView:  # main view test suite
             assert response.status_code == 200  # expects request to be successful
             assert response.request.path == url_for('auth.login')  # expects correct redirection
             assert '<h3 class="title">Login' in response.text  # expects correct template to be rendered
-            assert len(list(db.todos.find({'user_id': self.user.id}))) < 2  # expects new to-do to NOT have been added
+            assert len(todos.find_by_user(self.user.id)) < 2  # expects new to-do to NOT have been added
 
     # authenticated POST to index should add new to-do
-    def test_post_index_authenticated(self, client, context):
+    def test_post_index_authenticated(self, client, context, todos):
         with context:
             login_user(self.user)  # logs-in in mock user
             # sends POST request to view with form
@@ -90,12 +96,12 @@ class TestMainView:  # main view test suite
             assert response.request.path == url_for('main.index')  # expects correct redirection
             assert '<h3 class="title">Dorset To-Do List' in response.text  # expects correct template to be rendered
 
-            todo = db.todos.find({'user_id': self.user.id})[1]  # fetches new to-do from database
+            todo = todos.find_by_user(self.user.id)[1]  # fetches new to-do from database
             assert todo['content'] == self.content  # expects database value to match local value
             assert todo['degree'] == self.degree  # expects database value to match local value
 
     # unauthenticated POST to update should NOT change the object's attributes
-    def test_post_update_unauthenticated(self, client, context):
+    def test_post_update_unauthenticated(self, client, context, todos):
         with context:
             # sends POST request to view with form
             response = client.post(url_for('main.update', todo_id=self.todo['_id']),
@@ -105,12 +111,12 @@ class TestMainView:  # main view test suite
             assert response.request.path == url_for('auth.login')  # expects correct redirection
             assert '<h3 class="title">Login' in response.text  # expects correct template to be rendered
 
-            todo = db.todos.find_one({'_id': self.todo['_id']})  # fetches to-do from database
+            todo = todos.find_one(self.todo['_id'], self.user.id)  # fetches to-do from database
             assert todo['content'] == self.content  # expects database value to NOT have changed
             assert todo['degree'] == self.degree  # expects database value to NOT have changed
 
     # authenticated POST to update should change the object's attributes
-    def test_post_update_authenticated(self, client, context):
+    def test_post_update_authenticated(self, client, context, todos):
         with context:
             login_user(self.user)  # logs-in in mock user
             # sends POST request to view with form
@@ -121,12 +127,12 @@ class TestMainView:  # main view test suite
             assert response.request.path == url_for('main.index')  # expects correct redirection
             assert '<h3 class="title">Dorset To-Do List' in response.text  # expects correct template to be rendered
 
-            todo = db.todos.find_one({'_id': self.todo['_id']})  # fetches to-do from database
+            todo = todos.find_one(self.todo['_id'], self.user.id)  # fetches to-do from database
             assert todo['content'] == self.content_updated  # expects database value to have changed
             assert todo['degree'] == self.degree_updated  # expects database value to have changed
 
     # unauthenticated POST to done should NOT toggle the object's 'done' attribute
-    def test_post_done_unauthenticated(self, client, context):
+    def test_post_done_unauthenticated(self, client, context, todos):
         with context:
             # sends POST request to view
             response = client.post(url_for('main.done', todo_id=self.todo['_id']), follow_redirects=True)
@@ -134,10 +140,10 @@ class TestMainView:  # main view test suite
             assert response.request.path == url_for('auth.login')  # expects correct redirection
             assert '<h3 class="title">Login' in response.text  # expects correct template to be rendered
             # expects database value to NOT have changed
-            assert db.todos.find_one({'_id': self.todo['_id']})['done'] is self.todo['done']
+            assert todos.find_one(self.todo['_id'], self.user.id)['done'] is self.todo['done']
 
     # authenticated POST to done should toggle the object's 'done' attribute
-    def test_post_done_authenticated(self, client, context):
+    def test_post_done_authenticated(self, client, context, todos):
         with context:
             login_user(self.user)  # logs-in in mock user
             # sends POST request to view
@@ -146,20 +152,20 @@ class TestMainView:  # main view test suite
             assert response.request.path == url_for('main.index')  # expects correct redirection
             assert '<h3 class="title">Dorset To-Do List' in response.text  # expects correct template to be rendered
             # expects database value to have changed
-            assert db.todos.find_one({'_id': self.todo['_id']})['done'] is not self.todo['done']
+            assert todos.find_one(self.todo['_id'], self.user.id)['done'] is not self.todo['done']
 
     # unauthenticated POST to delete should NOT delete object
-    def test_post_delete_unauthenticated(self, client, context):
+    def test_post_delete_unauthenticated(self, client, context, todos):
         with context:
             # sends POST request to view
             response = client.post(url_for('main.delete', todo_id=self.todo['_id']), follow_redirects=True)
             assert response.status_code == 200  # expects request to be successful
             assert response.request.path == url_for('auth.login')  # expects correct redirection
             assert '<h3 class="title">Login' in response.text  # expects correct template to be rendered
-            assert db.todos.find_one({'_id': self.todo['_id']}) is not None  # expects to-do to NOT have been deleted
+            assert todos.find_one(self.todo['_id'], self.user.id) is not None  # expects to-do to NOT have been deleted
 
     # authenticated POST to delete should delete object
-    def test_post_delete_authenticated(self, client, context):
+    def test_post_delete_authenticated(self, client, context, todos):
         with context:
             login_user(self.user)  # logs-in in mock user
             # sends POST request to view
@@ -167,7 +173,66 @@ class TestMainView:  # main view test suite
             assert response.status_code == 200  # expects request to be successful
             assert response.request.path == url_for('main.index')  # expects correct redirection
             assert '<h3 class="title">Dorset To-Do List' in response.text  # expects correct template to be rendered
-            assert db.todos.find_one({'_id': self.todo['_id']}) is None  # expects to-do to have been deleted
+            assert todos.find_one(self.todo['_id'], self.user.id) is None  # expects to-do to have been deleted
+
+    # authenticated POSTs to index with the same idempotency key should add only one new to-do
+    def test_post_index_idempotent(self, client, context, todos):
+        with context:
+            content = 'pytest idempotent to-do'  # dummy content for testing
+            login_user(self.user)  # logs-in in mock user
+            for _ in range(2):  # sends the same POST request to view twice, as a retry would
+                response = client.post(url_for('main.index'),
+                                       data={'content': content, 'degree': self.degree, 'idempotency_key': 'pytest'})
+                assert response.status_code == 302  # expects both requests to get the same response
+                assert response.location == url_for('main.index')  # expects both requests to get the same response
+            # expects only one new to-do to have been added
+            assert len([todo for todo in todos.find_by_user(self.user.id) if todo['content'] == content]) == 1
+
+    # authenticated POST to index whose key is held by a request still being executed should be rejected, while
+    # one whose key was abandoned by a request that never completed (e.g. killed worker) should add new to-do
+    def test_post_index_abandoned_key(self, app, client, context, todos):
+        with context:
+            content = 'pytest abandoned to-do'  # dummy content for testing
+            store = app.config['IDEMPOTENCY_STORE']
+            login_user(self.user)  # logs-in in mock user
+
+            # reserves key as a request that is still being executed would
+            store.reserve(f"{self.user.id}:{url_for('main.index')}:pytest-running")
+            response = client.post(url_for('main.index'), data={'content': content, 'degree': self.degree,
+                                                                 'idempotency_key': 'pytest-running'})
+            assert response.status_code == 409  # expects request to be rejected
+
+            # reserves key as a request whose worker was killed would, leaving a lease that has already expired
+            lease, store.lease = store.lease, timedelta(seconds=-1)
+            store.reserve(f"{self.user.id}:{url_for('main.index')}:pytest-abandoned")
+            store.lease = lease
+            response = client.post(url_for('main.index'), data={'content': content, 'degree': self.degree,
+                                                                 'idempotency_key': 'pytest-abandoned'})
+            assert response.status_code == 302  # expects request to have taken the key over
+            # expects new to-do to have been added
+            assert len([todo for todo in todos.find_by_user(self.user.id) if todo['content'] == content]) == 1
+
+    # authenticated POST to update with an outdated version should NOT change the object's attributes
+    def test_post_update_conflict(self, client, context, todos):
+        with context:
+            # inserts mock to-do that has already been updated once
+            todo_id = todos.insert({'content': self.content, 'degree': self.degree, 'done': False,
+                                    'user_id': self.user.id, 'version': 2})
+            login_user(self.user)  # logs-in in mock user
+            # sends POST request to view with form holding the previous version
+            response = client.post(url_for('main.update', todo_id=todo_id),
+                                   data={'content': self.content_updated, 'degree': self.degree_updated, 'version': 1})
+            assert response.status_code == 409  # expects request to be rejected
+            assert todos.find_one(todo_id, self.user.id)['content'] == self.content  # expects it NOT to have changed
+
+            # sends POST request to view with form holding the current version
+            response = client.post(url_for('main.update', todo_id=todo_id),
+                                   data={'content': self.content_updated, 'degree': self.degree_updated, 'version': 2},
+                                   follow_redirects=True)
+            assert response.status_code == 200  # expects request to be successful
+            todo = todos.find_one(todo_id, self.user.id)  # fetches to-do from database
+            assert todo['content'] == self.content_updated  # expects database value to have changed
+            assert todo['version'] == 3  # expects version to have been bumped
 
     # unauthenticated GET to profile should NOT display account details
     def test_get_profile_unauthenticated(self, client, context):
@@ -189,25 +254,31 @@ class TestMainView:  # main view test suite
 
 class TestAuthView:  # auth view test suite
     user = None  # user model to be used in all test cases
-    email = 'pytest@email.com'  # dummy email for testing
-    other_email = 'other_pytest@email.com'  # dummy other email for testing
+    email = None  # dummy email for testing, unique to the class (see conftest.py)
+    other_email = None  # dummy other email for testing
     name = 'pytest'  # dummy name for testing
     password = 'pytest123'  # dummy password for testing
 
+    @pytest.fixture(scope='class', autouse=True)  # runs once per class (and repository backend)
     @classmethod
-    def setup_class(cls):  # prepares parameters that will be shared by the test cases
+    def mock_data(cls, app, users, email):  # prepares parameters that will be shared by the test cases
+        cls.email, cls.other_email = email, f'other_{email}'
         # inserts mock user to the database
-        db.users.insert_one({
+        users.insert({
             'email': cls.email,
             'name': cls.name,
             'password': generate_password_hash(cls.password, method='sha256')
         })
-        cls.user = User(db.users.find_one({'email': cls.email}))  # fetches mock user from the database
+        user = users.find_by_email(cls.email)  # fetches mock user from the database
+        cls.user = User(user, app.config['SESSION_STORE'].create(user))  # logs it in through a new session
 
-    @classmethod
-    def teardown_class(cls):  # clean up/reset resources previously created after all test cases are finished
-        db.users.delete_one({"_id": cls.user.id})  # deletes mock user from the database
-        db.users.delete_one({"email": cls.other_email})  # deletes other mock user from the database
+        yield  # runs the test cases
+
+        # clean up/reset resources previously created after all test cases are finished
+        users.delete(cls.user.id)  # deletes mock user from the database
+        other_user = users.find_by_email(cls.other_email)  # fetches other mock user from the database
+        if other_user:
+            users.delete(other_user['_id'])  # deletes other mock user from the database
 
     # unauthenticated GET to 'login' should display login page
     def test_get_login_unauthenticated(self, client, context):
@@ -275,7 +346,7 @@ class TestAuthView:  # auth view test suite
 
     # unauthenticated POST to 'signup' should display error message if email is already in use or
     # add new user if email is available
-    def test_post_signup_unauthenticated(self, client, context):
+    def test_post_signup_unauthenticated(self, client, context, users):
         with context:
             # sends POST request to view with form
             response = client.post(url_for('auth.signup'),
@@ -285,7 +356,7 @@ class TestAuthView:  # auth view test suite
             assert response.request.path == url_for('auth.signup')  # expects correct redirection
             assert 'Email address already exists' in response.text  # expects correct template to be rendered
             # expects new user with same email to NOT have been added
-            assert len(list(db.users.find({'email': self.email}))) == 1
+            assert users.count_by_email(self.email) == 1
 
             # sends POST request to view with form
             response = client.post(url_for('auth.signup'),
@@ -295,10 +366,10 @@ class TestAuthView:  # auth view test suite
             assert response.request.path == url_for('auth.login')  # expects correct redirection
             assert '<h3 class="title">Login' in response.text  # expects correct template to be rendered
             # expects new user with different email to have been added
-            assert db.users.find_one({'email': self.other_email}) is not None
+            assert users.find_by_email(self.other_email) is not None
 
     # authenticated POST to 'signup' should redirect to home page
-    def test_post_signup_authenticated(self, client, context):
+    def test_post_signup_authenticated(self, client, context, users):
         with context:
             login_user(self.user)  # logs-in in mock user
             # sends POST request to view with form
@@ -309,7 +380,7 @@ class TestAuthView:  # auth view test suite
             assert response.request.path == url_for('main.index')  # expects correct redirection
             assert '<h3 class="title">Dorset To-Do List' in response.text  # expects correct template to be rendered
             # expects new user with same email to NOT have been added
-            assert len(list(db.users.find({'email': self.email}))) == 1
+            assert users.count_by_email(self.email) == 1
 
     # unauthenticated GET to 'logout' should redirect to login page
     def test_get_logout_unauthenticated(self, client, context):
@@ -329,9 +400,9 @@ class TestAuthView:  # auth view test suite
             assert '<h3 class="title">Start using' in response.text  # expects correct template to be rendered
 
     # unauthenticated POST to 'update' should redirect to login page
-    def test_post_update_unauthenticated(self, client, context):
+    def test_post_update_unauthenticated(self, client, context, users):
         with context:
-            new_email = 'new_pytest@email.com'  # dummy new email for testing
+            new_email = f'new_{self.email}'  # dummy new email for testing
             new_name = 'new_pytest'  # dummy new name for testing
             new_password = 'new_pytest123'  # dummy new password for testing
 
@@ -343,7 +414,7 @@ class TestAuthView:  # auth view test suite
             assert response.request.path == url_for('auth.login')  # expects correct redirection
             assert '<h3 class="title">Login' in response.text  # expects correct template to be rendered
 
-            user = db.users.find_one({'_id': self.user.id})  # fetches mock user from the database
+            user = users.find_by_id(self.user.id)  # fetches mock user from the database
             assert user['email'] == self.email and user['email'] != new_email  # expects it NOT to have changed
             assert user['name'] == self.name and user['name'] != new_name  # expects it NOT to have changed
             # expects it NOT to have changed
@@ -351,9 +422,9 @@ class TestAuthView:  # auth view test suite
                                                                                                     new_password)
 
     # authenticated POST to 'update' should make changes to database and redirect to profile page
-    def test_post_update_authenticated(self, client, context):
+    def test_post_update_authenticated(self, client, context, users):
         with context:
-            new_email = 'new_pytest@email.com'  # dummy new email for testing
+            new_email = f'new_{self.email}'  # dummy new email for testing
             new_name = 'new_pytest'  # dummy new name for testing
             new_password = 'new_pytest123'  # dummy new password for testing
 
@@ -366,7 +437,7 @@ class TestAuthView:  # auth view test suite
             assert response.request.path == url_for('main.profile')  # expects correct redirection
             assert '<h3 class="title">Account Details' in response.text  # expects correct template to be rendered
 
-            user = db.users.find_one({'_id': self.user.id})  # fetches mock user from the database
+            user = users.find_by_id(self.user.id)  # fetches mock user from the database
             assert user['email'] != self.email and user['email'] == new_email  # expects it to have changed
             assert user['name'] != self.name and user['name'] == new_name  # expects it to have changed
             # expects it to have changed
@@ -374,17 +445,17 @@ class TestAuthView:  # auth view test suite
                                                                                                     new_password)
 
     # unauthenticated POST to 'delete' should redirect to login page
-    def test_post_delete_unauthenticated(self, client, context):
+    def test_post_delete_unauthenticated(self, client, context, users):
         with context:
             # sends POST request to view
             response = client.post(url_for('auth.delete', user_id=self.user.id), follow_redirects=True)
             assert response.status_code == 200  # expects request to be successful
             assert response.request.path == url_for('auth.login')  # expects correct redirection
             assert '<h3 class="title">Login' in response.text  # expects correct template to be rendered
-            assert db.users.find_one({'_id': self.user.id}) is not None  # expects it NOT to have been deleted
+            assert users.find_by_id(self.user.id) is not None  # expects it NOT to have been deleted
 
     # authenticated POST to 'delete' should make changes to database and redirect to home page
-    def test_post_delete_authenticated(self, client, context):
+    def test_post_delete_authenticated(self, client, context, users):
         with context:
             login_user(self.user)  # logs-in in mock user
             # sends POST request to view
@@ -392,4 +463,4 @@ class TestAuthView:  # auth view test suite
             assert response.status_code == 200  # expects request to be successful
             assert response.request.path == url_for('main.index')  # expects correct redirection
             assert '<h3 class="title">Start using' in response.text  # expects correct template to be rendered
-            assert db.users.find_one({'_id': self.user.id}) is None  # expects it to have been deleted
+            assert users.find_by_id(self.user.id) is None  # expects it to have been deleted